@@ -1,6 +1,13 @@
+import asyncio
+import atexit
+import functools
+import json
 import logging
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Sequence, Optional
+from typing import Awaitable, Callable, Generator, Hashable, Iterator, Sequence, Optional, TypeVar
 from mcp.server import Server
 from mcp.server.session import ServerSession
 from mcp.server.stdio import stdio_server
@@ -14,12 +21,56 @@ from mcp.types import (
 )
 from enum import Enum
 import git
+from git import Actor, NULL_TREE
 from git.exc import BadName
 from pydantic import BaseModel, Field
 
 # Default number of context lines to show in diff output
 DEFAULT_CONTEXT_LINES = 3
 
+# Diffs larger than this are replaced by a per-file summary (see summary_only)
+MAX_PATCH_BYTES = 1024 * 1024
+
+# git_show skips the patch for any file whose old or new version is larger than this
+MAX_DIFF_BYTES = int(os.environ.get("MCP_GIT_MAX_DIFF_BYTES", 512 * 1024))
+
+# Tree entry mode of submodule commits, which have no blob to size
+_GITLINK_MODE = 0o160000
+
+# Maximum number of open repositories kept in the cache between tool calls
+REPO_CACHE_SIZE = 32
+
+# Repositories opened by call_tool, keyed by resolved path, in LRU order
+_REPO_CACHE: OrderedDict[Path, git.Repo] = OrderedDict()
+
+# Environment for every git command run on a cached repository: don't take
+# optional locks (so read-only commands like status never write the index),
+# never prompt for credentials, and never start a pager. GitPython already
+# sets LC_ALL=C and LANGUAGE=C for each command.
+_GIT_ENVIRONMENT = {
+    "GIT_OPTIONAL_LOCKS": "0",
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_PAGER": "cat",
+}
+
+# Per-repository locks, keyed by git dir. GitPython's persistent cat-file
+# processes are not thread-safe, so in-process object reads on one repository
+# are serialized (see object_lock); plain git subprocesses run concurrently.
+_REPO_LOCKS: dict[Path, threading.Lock] = {}
+
+# Per-repository locks held for the whole run of every tool that writes (see
+# run_tool), so concurrent writes don't fail on git's index.lock. Lock order:
+# a write lock is always taken before the object lock of the same repository.
+_WRITE_LOCKS: dict[Path, threading.Lock] = {}
+
+# Git dirs for which a commit-graph write was already considered this process
+_COMMIT_GRAPH_CHECKED: set[Path] = set()
+
+_SUMMARY_ONLY_DESCRIPTION = (
+    "When True, list changed files with added/removed line counts instead of the full patch. "
+    f"Diffs over {MAX_PATCH_BYTES} bytes are always summarized."
+)
+
 class GitStatus(BaseModel):
     repo_path: str
     paths: Optional[list[str]] = None
@@ -29,12 +80,20 @@ class GitDiffUnstaged(BaseModel):
     context_lines: int = DEFAULT_CONTEXT_LINES
     ignore_whitespace: bool = False
     paths: Optional[list[str]] = None
+    summary_only: bool = Field(
+        False,
+        description=_SUMMARY_ONLY_DESCRIPTION
+    )
 
 class GitDiffStaged(BaseModel):
     repo_path: str
     context_lines: int = DEFAULT_CONTEXT_LINES
     ignore_whitespace: bool = False
     paths: Optional[list[str]] = None
+    summary_only: bool = Field(
+        False,
+        description=_SUMMARY_ONLY_DESCRIPTION
+    )
 
 class GitDiff(BaseModel):
     repo_path: str
@@ -47,6 +106,10 @@ class GitDiff(BaseModel):
     context_lines: int = DEFAULT_CONTEXT_LINES
     ignore_whitespace: bool = False
     paths: Optional[list[str]] = None
+    summary_only: bool = Field(
+        False,
+        description=_SUMMARY_ONLY_DESCRIPTION
+    )
 
 class GitCommit(BaseModel):
     repo_path: str
@@ -135,67 +198,193 @@ class GitTools(str, Enum):
 
     BRANCH = "git_branch"
 
+_GLOB_CHARS = frozenset("*?[")
+
+def normalize_pathspecs(paths: list[str]) -> list[str]:
+    """Rewrite 'dir/*' style pathspecs to the plain directory 'dir'.
+
+    Git's '*' also matches '/', so both forms select the same files, but only
+    literal pathspecs can use the commit-graph's changed-path Bloom filters.
+    Other wildcards are passed through unchanged.
+    """
+    normalized = []
+    for path in paths:
+        stripped = path
+        while stripped.endswith(("/*", "/**")):
+            stripped = stripped.rstrip("*")[:-1]
+        if stripped != path and stripped and not stripped.startswith(":") and _GLOB_CHARS.isdisjoint(stripped):
+            path = stripped
+        normalized.append(path)
+    return normalized
+
+def _reject_flag(name: str, value: str | None) -> None:
+    """Reject a ref-like argument that git could parse as something else.
+
+    Defense in depth against flag injection: values starting with '-' are
+    rejected even if a ref with that name exists (e.g. one created through
+    filesystem manipulation), as are empty values and values with NUL bytes.
+    """
+    if value is None:
+        return
+    if not value:
+        raise BadName(f"Invalid {name}: value cannot be empty")
+    if value[0] == "-":
+        raise BadName(f"Invalid {name}: '{value}' - cannot start with '-'")
+    if "\0" in value:
+        raise BadName(f"Invalid {name}: {value!r} - cannot contain NUL bytes")
+
+# Porcelain commands (status, diff, log, grep, branch) go through the git CLI so
+# that pathspecs, date parsing and output formats match what users get from git.
+# Object reads (commits, blobs, refs) are served in-process by GitPython over the
+# persistent `git cat-file` processes of the cached Repo.
 def git_status(repo: git.Repo, paths: list[str] | None = None) -> str:
-    args = []
+    # Ask for the compact machine-readable format and render it here, rather than
+    # shipping git's verbose human-oriented output
+    args = ["--porcelain=v2", "--branch", "-z"]
     if paths:
-        args.extend(["--", *paths])
-    return repo.git.status(*args)
-
-def git_diff_unstaged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None) -> str:
+        args.extend(["--", *normalize_pathspecs(paths)])
+    return _format_status(repo.git.status(*args))
+
+def _format_status(porcelain: str) -> str:
+    """Render `git status --porcelain=v2 --branch -z` output as a short summary."""
+    oid = head = upstream = ahead_behind = None
+    changes = []
+    entries = iter(porcelain.split("\0"))
+    for entry in entries:
+        kind, _, rest = entry.partition(" ")
+        match kind:
+            case "#":
+                key, _, value = rest.partition(" ")
+                if key == "branch.oid":
+                    oid = value
+                elif key == "branch.head":
+                    head = value
+                elif key == "branch.upstream":
+                    upstream = value
+                elif key == "branch.ab":
+                    ahead, behind = value.split(" ")
+                    ahead_behind = f"ahead {ahead[1:]}, behind {behind[1:]}"
+            case "1":
+                fields = rest.split(" ", 7)
+                changes.append(f"{fields[0].replace('.', ' ')} {fields[7]}")
+            case "2":
+                fields = rest.split(" ", 8)
+                # Renames and copies are followed by a separate entry with the original path
+                changes.append(f"{fields[0].replace('.', ' ')} {next(entries)} -> {fields[8]}")
+            case "u":
+                fields = rest.split(" ", 9)
+                changes.append(f"{fields[0]} {fields[9]}")
+            case "?":
+                changes.append(f"?? {rest}")
+
+    if head == "(detached)":
+        lines = [f"HEAD detached at {oid[:7]}" if oid else "HEAD detached"]
+    else:
+        lines = [f"On branch {head}"]
+    if oid == "(initial)":
+        lines.append("No commits yet")
+    if upstream:
+        lines.append(f"Upstream: {upstream} ({ahead_behind})" if ahead_behind else f"Upstream: {upstream} (gone)")
+    lines.extend(changes or ["nothing to commit, working tree clean"])
+    return "\n".join(lines)
+
+def git_diff_unstaged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None, summary_only: bool = False) -> bytes:
     args = [f"--unified={context_lines}"]
     if ignore_whitespace:
         args.append("-w")
+    operands = []
     if paths:
-        args.extend(["--", *paths])
-    return repo.git.diff(*args)
+        operands.extend(["--", *normalize_pathspecs(paths)])
+    return _diff(repo, args, operands, summary_only)
 
-def git_diff_staged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None) -> str:
+def git_diff_staged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None, summary_only: bool = False) -> bytes:
     args = [f"--unified={context_lines}", "--cached"]
     if ignore_whitespace:
         args.append("-w")
+    operands = []
     if paths:
-        args.extend(["--", *paths])
-    return repo.git.diff(*args)
-
-def git_diff(repo: git.Repo, target: str, base: str | None = None, merge_base: bool = False, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None) -> str:
-    # Defense in depth: reject targets starting with '-' to prevent flag injection,
-    # even if a malicious ref with that name exists (e.g. via filesystem manipulation)
-    if target.startswith("-"):
-        raise BadName(f"Invalid target: '{target}' - cannot start with '-'")
-    if base and base.startswith("-"):
-        raise BadName(f"Invalid base: '{base}' - cannot start with '-'")
+        operands.extend(["--", *normalize_pathspecs(paths)])
+    return _diff(repo, args, operands, summary_only)
+
+def git_diff(repo: git.Repo, target: str, base: str | None = None, merge_base: bool = False, context_lines: int = DEFAULT_CONTEXT_LINES, ignore_whitespace: bool = False, paths: list[str] | None = None, summary_only: bool = False) -> bytes:
+    _reject_flag("target", target)
+    _reject_flag("base", base or None)
     
-    repo.rev_parse(target)  # Validates target is a real git ref, throws BadName if not
-    if base:
-        repo.rev_parse(base)
+    # Resolve refs once in-process (throws BadName if not a real git ref) and pass
+    # the object ids on, so git does not have to resolve the names a second time
+    with object_lock(repo):
+        target_sha = repo.rev_parse(target).hexsha
+        base_sha = repo.rev_parse(base).hexsha if base else None
 
     args = [f"--unified={context_lines}"]
     if ignore_whitespace:
         args.append("-w")
     
+    operands = []
     if base:
         if merge_base:
             # Three-dot notation: diffs target against the merge base of base and target.
             # This shows only changes introduced by target's branch, ignoring commits
             # added to base after the branches diverged (ideal for PR review).
-            args.append(f"{base}...{target}")
+            operands.append(f"{base_sha}...{target_sha}")
         else:
-            args.extend([base, target])
+            operands.extend([base_sha, target_sha])
     else:
-        args.append(target)
+        operands.append(target_sha)
         
     if paths:
-        args.extend(["--", *paths])
+        operands.extend(["--", *normalize_pathspecs(paths)])
         
-    return repo.git.diff(*args)
+    return _diff(repo, args, operands, summary_only)
+
+def _diff(repo: git.Repo, args: list[str], operands: list[str], summary_only: bool) -> bytes:
+    """Run git diff, falling back to a --raw --numstat summary for oversized patches."""
+    note = b""
+    if not summary_only:
+        patch = bytearray()
+        chunks = _iter_stdout(repo.git.diff(*args, *operands, as_process=True))
+        for chunk in chunks:
+            patch += chunk
+            if len(patch) > MAX_PATCH_BYTES:
+                # Stop git instead of buffering a patch we are going to throw away
+                chunks.close()
+                break
+        else:
+            return bytes(patch)
+        note = (
+            f"Patch is over the {MAX_PATCH_BYTES} byte limit. "
+            "Showing a summary instead; pass paths to see individual patches.\n"
+        ).encode("utf-8")
+    # Summaries are O(files) to produce, unlike patches which are O(bytes changed)
+    summary_args = [arg for arg in args if not arg.startswith("--unified")]
+    return note + repo.git.diff(*summary_args, "--raw", "--numstat", *operands, stdout_as_string=False)
+
+def _iter_stdout(proc: git.Git.AutoInterrupt) -> Generator[bytes, None, None]:
+    """Yield the stdout of a git process started with as_process=True as it arrives.
+
+    stderr is drained on a separate thread so git can't block on a full stderr
+    pipe while we wait on stdout. Raises GitCommandError once stdout is
+    exhausted if git failed; closing the generator early kills git instead.
+    """
+    stderr: list[bytes] = []
+    drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    drain.start()
+    try:
+        yield from iter(lambda: proc.stdout.read1(65536), b"")
+    except GeneratorExit:
+        proc.kill()
+        raise
+    finally:
+        drain.join()
+    proc.wait(stderr=b"".join(stderr))
 
 def git_commit(repo: git.Repo, message: str, author_name: str | None = None, author_email: str | None = None) -> str:
     author = None
     if author_name and author_email:
-        from git import Actor
         author = Actor(author_name, author_email)
 
-    commit = repo.index.commit(message, author=author)
+    with object_lock(repo):
+        commit = repo.index.commit(message, author=author)
     return f"Changes committed successfully with hash {commit.hexsha}"
 
 def git_add(repo: git.Repo, files: list[str]) -> str:
@@ -207,13 +396,14 @@ def git_add(repo: git.Repo, files: list[str]) -> str:
     return "Files staged successfully"
 
 def git_reset(repo: git.Repo, paths: list[str] | None = None) -> str:
-    if paths:
-        repo.index.reset(paths=paths)
-        return f"Reset {len(paths)} files"
-    repo.index.reset()
+    with object_lock(repo):
+        if paths:
+            repo.index.reset(paths=paths)
+            return f"Reset {len(paths)} files"
+        repo.index.reset()
     return "All staged changes reset"
 
-def git_log(repo: git.Repo, max_count: int = 10, revision_range: str | None = None, paths: list[str] | None = None, start_timestamp: str | None = None, end_timestamp: str | None = None) -> list[str]:
+def git_log(repo: git.Repo, max_count: int = 10, revision_range: str | None = None, paths: list[str] | None = None, start_timestamp: str | None = None, end_timestamp: str | None = None) -> Iterator[str]:
     # Defense in depth: reject values starting with '-' to prevent flag injection
     if start_timestamp and start_timestamp.startswith("-"):
         raise ValueError(f"Invalid start_timestamp: '{start_timestamp}' - cannot start with '-'")
@@ -226,83 +416,132 @@ def git_log(repo: git.Repo, max_count: int = 10, revision_range: str | None = No
             if p.startswith("-"):
                 raise ValueError(f"Invalid path: '{p}' - cannot start with '-'")
 
-    kwargs = {'max_count': max_count}
+    # Ask git for just the fields we print, NUL-separated per commit and
+    # unit-separated per field, instead of building a Commit object per entry
+    args = [f"--max-count={max_count}", "-z", f"--format={_LOG_FORMAT}"]
     if start_timestamp:
-        kwargs['since'] = start_timestamp
+        args.append(f"--since={start_timestamp}")
     if end_timestamp:
-        kwargs['until'] = end_timestamp
+        args.append(f"--until={end_timestamp}")
     if revision_range:
-        kwargs['rev'] = revision_range
+        args.append(revision_range)
+    args.append("--")
     if paths:
-        kwargs['paths'] = paths
-        
-    commits = list(repo.iter_commits(**kwargs))
-    log = []
-    for commit in commits:
-        log.append(
-            f"Commit: {commit.hexsha!r}\n"
-            f"Author: {commit.author!r}\n"
-            f"Date: {commit.authored_datetime}\n"
-            f"Message: {commit.message!r}\n"
-        )
-    return log
+        args.extend(normalize_pathspecs(paths))
+
+    # Entries are formatted as git produces them so callers can consume the log
+    # incrementally instead of waiting for every entry to be materialized
+    return _iter_log(repo.git.log(*args, as_process=True))
+
+_LOG_FORMAT = "%H%x1f%an <%ae>%x1f%aI%x1f%B"
+
+def _iter_log(proc: git.Git.AutoInterrupt) -> Iterator[str]:
+    pending = b""
+    # Raises GitCommandError at the end if git log failed
+    for chunk in _iter_stdout(proc):
+        *records, pending = (pending + chunk).split(b"\0")
+        for record in records:
+            yield _format_log_entry(*record.decode("utf-8", errors="replace").split("\x1f", 3))
+    if pending:
+        yield _format_log_entry(*pending.decode("utf-8", errors="replace").split("\x1f", 3))
+
+def _format_commit(commit: git.Commit) -> str:
+    message = commit.message
+    if isinstance(message, bytes):
+        # GitPython leaves the message undecoded if it isn't in the commit's encoding
+        message = message.decode("utf-8", errors="replace")
+    return _format_log_entry(
+        commit.hexsha,
+        f"{commit.author.name} <{commit.author.email}>",
+        commit.authored_datetime.isoformat(),
+        message,
+    )
+
+def _format_log_entry(sha: str, author: str, date: str, message: str) -> str:
+    return (
+        f"Commit: {sha}\n"
+        f"Author: {author}\n"
+        f"Date: {date}\n"
+        f"Message: {message.rstrip()}\n"
+    )
 
 def git_create_branch(repo: git.Repo, branch_name: str, base_branch: str | None = None) -> str:
-    # Defense in depth: reject names starting with '-' to prevent flag injection
-    if branch_name.startswith("-"):
-        raise BadName(f"Invalid branch name: '{branch_name}' - cannot start with '-'")
-    if base_branch and base_branch.startswith("-"):
-        raise BadName(f"Invalid base branch: '{base_branch}' - cannot start with '-'")
-    if base_branch:
-        base = repo.references[base_branch]
-    else:
-        base = repo.active_branch
+    _reject_flag("branch name", branch_name)
+    _reject_flag("base branch", base_branch or None)
+    with object_lock(repo):
+        if base_branch:
+            base = repo.references[base_branch]
+        else:
+            base = repo.active_branch
 
-    repo.create_head(branch_name, base)
+        repo.create_head(branch_name, base)
     return f"Created branch '{branch_name}' from '{base.name}'"
 
 def git_checkout(repo: git.Repo, branch_name: str) -> str:
-    # Defense in depth: reject branch names starting with '-' to prevent flag injection,
-    # even if a malicious ref with that name exists (e.g. via filesystem manipulation)
-    if branch_name.startswith("-"):
-        raise BadName(f"Invalid branch name: '{branch_name}' - cannot start with '-'")
-    repo.rev_parse(branch_name)  # Validates branch_name is a real git ref, throws BadName if not
-    repo.git.checkout(branch_name)
+    _reject_flag("branch name", branch_name)
+    # The trailing '--' makes git treat branch_name strictly as a ref rather than
+    # a path, so git validates it during checkout instead of a separate lookup
+    try:
+        repo.git.checkout(branch_name, "--")
+    except git.GitCommandError as e:
+        if "invalid reference" in str(e.stderr):
+            raise BadName(f"Invalid branch name: '{branch_name}' - not a valid reference") from e
+        raise
     return f"Switched to branch '{branch_name}'"
 
 
 
-def git_show(repo: git.Repo, revision: str) -> str:
-    # Defense in depth: reject revisions starting with '-' to prevent flag injection,
-    # even if a malicious ref with that name exists (e.g. via filesystem manipulation)
-    if revision.startswith("-"):
-        raise BadName(f"Invalid revision: '{revision}' - cannot start with '-'")
-    commit = repo.commit(revision)
-    output = [
-        f"Commit: {commit.hexsha!r}\n"
-        f"Author: {commit.author!r}\n"
-        f"Date: {commit.authored_datetime!r}\n"
-        f"Message: {commit.message!r}\n"
-    ]
-    if commit.parents:
-        parent = commit.parents[0]
-        diff = parent.diff(commit, create_patch=True)
-    else:
-        diff = commit.diff(git.NULL_TREE, create_patch=True)
-    for d in diff:
-        output.append(f"\n--- {d.a_path}\n+++ {d.b_path}\n")
-        if d.diff is None:
-            continue
-        if isinstance(d.diff, bytes):
-            output.append(d.diff.decode('utf-8'))
+def git_show(repo: git.Repo, revision: str) -> bytes:
+    _reject_flag("revision", revision)
+    with object_lock(repo):
+        commit = repo.commit(revision)
+        header = _format_commit(commit)
+        if commit.parents:
+            old, new = commit.parents[0], commit
         else:
-            output.append(d.diff)
-    return "".join(output)
+            old, new = commit, NULL_TREE
+        # List the changed files first without patches, so oversized files can be
+        # left out before git generates (and we buffer) their patch text
+        changes = old.diff(new)
+        oversized = [
+            max(_blob_size(d.a_blob), _blob_size(d.b_blob)) > MAX_DIFF_BYTES
+            for d in changes
+        ]
+
+    # A single git process generates the patches of all remaining files. They are
+    # matched back by path: patch entries leave the missing side's path unset, and
+    # a type change (e.g. file to symlink) comes as a delete and an add of one path.
+    patches: dict[str | None, bytes] = {}
+    if not all(oversized):
+        excludes = tuple(
+            f":(exclude,literal){path}"
+            for d, skip in zip(changes, oversized) if skip
+            for path in {d.a_path, d.b_path} if path
+        )
+        for fd in old.diff(new, excludes, create_patch=True):
+            # Binary files and .gitattributes (binary, -diff) are already handled
+            # by git itself, which prints "Binary files ... differ" for them
+            patch = fd.diff if isinstance(fd.diff, bytes) else (fd.diff or "").encode("utf-8")
+            key = fd.b_path or fd.a_path
+            patches[key] = patches.get(key, b"") + patch
+
+    # Patches stay bytes; callers decode once when building the tool result
+    parts = [header.encode("utf-8")]
+    for d, skip in zip(changes, oversized):
+        parts.append(f"\n--- {d.a_path}\n+++ {d.b_path}\n".encode("utf-8"))
+        if skip:
+            parts.append(f"Diff omitted: file is larger than {MAX_DIFF_BYTES} bytes\n".encode("utf-8"))
+        else:
+            parts.append(patches[d.b_path or d.a_path])
+    return b"".join(parts)
+
+def _blob_size(blob: git.IndexObject | None) -> int:
+    if blob is None or blob.mode == _GITLINK_MODE:
+        return 0
+    return blob.size
 
 def git_grep(repo: git.Repo, pattern: str, revision: str | None = None, paths: list[str] | None = None, ignore_case: bool = False, line_numbers: bool = True) -> str:
-    # Defense in depth: reject revisions starting with '-' to prevent flag injection
-    if revision and revision.startswith("-"):
-        raise BadName(f"Invalid revision: '{revision}' - cannot start with '-'")
+    _reject_flag("revision", revision or None)
     args = []
     if ignore_case:
         args.append("-i")
@@ -319,19 +558,98 @@ def git_grep(repo: git.Repo, pattern: str, revision: str | None = None, paths: l
     args.append("--")
     
     if paths:
-        args.extend(paths)
+        args.extend(normalize_pathspecs(paths))
         
     return repo.git.grep(*args)
 
-def validate_repo_path(repo_path: Path, allowed_repository: Path | None) -> None:
-    """Validate that repo_path is within the allowed repository path."""
-    if allowed_repository is None:
-        return  # No restriction configured
-
+def get_repo(repo_path: Path) -> git.Repo:
+    """Return a cached Repo for repo_path, opening it on first use.
+
+    repo_path must be the resolved path returned by validate_repo_path. It is
+    not resolved again, so a symlink swapped in after validation is not followed
+    to pick the cache entry.
+    """
+    key = repo_path
+    repo = _REPO_CACHE.get(key)
+    if repo is not None:
+        _REPO_CACHE.move_to_end(key)
+        return repo
+
+    # GitCmdObjectDB (GitPython's default, spelled out because we rely on it)
+    # serves object reads through one long-lived `git cat-file --batch` and
+    # `--batch-check` process per Repo, which the cache keeps alive across calls
+    repo = git.Repo(key, odbt=git.GitCmdObjectDB)
+    # Make sure git reads the commit-graph and its changed-path Bloom filters even
+    # if user config disables them; these speed up log/branch walks considerably
+    repo.git.set_persistent_git_options(
+        c=["core.commitGraph=true", "commitGraph.readChangedPaths=true"]
+    )
+    repo.git.update_environment(**_GIT_ENVIRONMENT)
+    git_dir = Path(repo.git_dir)
+    if git_dir not in _COMMIT_GRAPH_CHECKED:
+        # Only once per process, so reopening an evicted repo doesn't write again
+        _COMMIT_GRAPH_CHECKED.add(git_dir)
+        threading.Thread(target=_write_commit_graph, args=(repo,), daemon=True).start()
+    _REPO_CACHE[key] = repo
+    if len(_REPO_CACHE) > REPO_CACHE_SIZE:
+        # A worker thread may still be using the evicted repo; Repo.__del__
+        # closes it once the last reference is gone
+        _REPO_CACHE.popitem(last=False)
+    return repo
+
+def object_lock(repo: git.Repo) -> threading.Lock:
+    """Return the lock guarding repo's persistent cat-file processes.
+
+    Hold it around anything that reads objects or refs in-process (repo.commit,
+    rev_parse, blob sizes, index and ref writes). Tools that only run git
+    subprocesses don't take it, so they never wait behind one another.
+    Never take a write lock while holding it.
+    """
+    return _REPO_LOCKS.setdefault(Path(repo.git_dir), threading.Lock())
+
+def _write_commit_graph(repo: git.Repo) -> None:
+    """Write a commit-graph for repo if it has none. Best effort, failures are ignored.
+
+    An existing graph (single file or split chain) is left alone: rewriting it
+    costs minutes of CPU on large histories, and git still reads it for the
+    commits it covers.
+    """
+    info = Path(repo.common_dir) / "objects" / "info"
+    if (info / "commit-graph").exists() or (info / "commit-graphs").is_dir():
+        return
+    try:
+        repo.git.commit_graph("write", "--reachable", "--changed-paths")
+    except git.GitCommandError as e:
+        logging.getLogger(__name__).debug(f"Could not write commit-graph for {repo.working_dir}: {e}")
+
+@atexit.register
+def close_repos() -> None:
+    """Close all cached repositories, releasing git subprocesses and file handles."""
+    while _REPO_CACHE:
+        _, repo = _REPO_CACHE.popitem()
+        repo.close()
+
+def _is_repo(path: str) -> bool:
+    try:
+        with git.Repo(path):
+            return True
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        return False
+
+@functools.lru_cache(maxsize=8)
+def _resolve_allowed_repository(path: Path) -> Path:
+    # The allowed repository is fixed for the lifetime of the server. repo_path is
+    # never cached: a directory swapped for a symlink must be caught on the next call.
+    return path.resolve()
+
+def validate_repo_path(repo_path: Path, allowed_repository: Path | None) -> Path:
+    """Validate that repo_path is within the allowed repository path and return it resolved."""
     # Resolve both paths to handle symlinks and relative paths
     try:
         resolved_repo = repo_path.resolve()
-        resolved_allowed = allowed_repository.resolve()
+        if allowed_repository is None:
+            return resolved_repo  # No restriction configured
+        resolved_allowed = _resolve_allowed_repository(allowed_repository)
     except (OSError, RuntimeError):
         raise ValueError(f"Invalid path: {repo_path}")
 
@@ -342,14 +660,12 @@ def validate_repo_path(repo_path: Path, allowed_repository: Path | None) -> None
         raise ValueError(
             f"Repository path '{repo_path}' is outside the allowed repository '{allowed_repository}'"
         )
+    return resolved_repo
 
 
 def git_branch(repo: git.Repo, branch_type: str, contains: str | None = None, not_contains: str | None = None) -> str:
-    # Defense in depth: reject values starting with '-' to prevent flag injection
-    if contains and contains.startswith("-"):
-        raise BadName(f"Invalid contains value: '{contains}' - cannot start with '-'")
-    if not_contains and not_contains.startswith("-"):
-        raise BadName(f"Invalid not_contains value: '{not_contains}' - cannot start with '-'")
+    _reject_flag("contains value", contains)
+    _reject_flag("not_contains value", not_contains)
 
     match contains:
         case None:
@@ -379,6 +695,357 @@ def git_branch(repo: git.Repo, branch_type: str, contains: str | None = None, no
     return branch_info
 
 
+def _handle_status(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    status = git_status(repo, arguments.get("paths"))
+    return [TextContent(
+        type="text",
+        text=f"Repository status:\n{status}"
+    )]
+
+def _handle_diff_unstaged(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    diff = git_diff_unstaged(
+        repo,
+        arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+        arguments.get("ignore_whitespace", False),
+        arguments.get("paths"),
+        arguments.get("summary_only", False)
+    )
+    return [TextContent(
+        type="text",
+        text="Unstaged changes:\n" + diff.decode("utf-8", errors="replace")
+    )]
+
+def _handle_diff_staged(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    diff = git_diff_staged(
+        repo,
+        arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+        arguments.get("ignore_whitespace", False),
+        arguments.get("paths"),
+        arguments.get("summary_only", False)
+    )
+    return [TextContent(
+        type="text",
+        text="Staged changes:\n" + diff.decode("utf-8", errors="replace")
+    )]
+
+def _handle_diff(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    diff = git_diff(
+        repo,
+        arguments["target"],
+        arguments.get("base"),
+        arguments.get("merge_base", False),
+        arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+        arguments.get("ignore_whitespace", False),
+        arguments.get("paths"),
+        arguments.get("summary_only", False)
+    )
+    return [TextContent(
+        type="text",
+        text=f"Diff with {arguments['target']}:\n" + diff.decode("utf-8", errors="replace")
+    )]
+
+def _handle_commit(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_commit(
+        repo,
+        arguments["message"],
+        arguments.get("author_name"),
+        arguments.get("author_email")
+    )
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_add(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_add(repo, arguments["files"])
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_reset(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_reset(repo, arguments.get("paths"))
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_log(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    log = git_log(
+        repo,
+        arguments.get("max_count", 10),
+        arguments.get("revision_range"),
+        arguments.get("paths"),
+        arguments.get("start_timestamp"),
+        arguments.get("end_timestamp")
+    )
+    return [TextContent(
+        type="text",
+        text="Commit history:\n" + "\n".join(log)
+    )]
+
+def _handle_create_branch(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_create_branch(
+        repo,
+        arguments["branch_name"],
+        arguments.get("base_branch")
+    )
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_checkout(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_checkout(repo, arguments["branch_name"])
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_show(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_show(repo, arguments["revision"])
+    return [TextContent(
+        type="text",
+        text=result.decode("utf-8", errors="replace")
+    )]
+
+def _handle_grep(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_grep(
+        repo,
+        arguments["pattern"],
+        arguments.get("revision"),
+        arguments.get("paths"),
+        arguments.get("ignore_case", False),
+        arguments.get("line_numbers", True),
+    )
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+def _handle_branch(repo: git.Repo, arguments: dict) -> list[TextContent]:
+    result = git_branch(
+        repo,
+        arguments.get("branch_type", 'local'),
+        arguments.get("contains", None),
+        arguments.get("not_contains", None),
+    )
+    return [TextContent(
+        type="text",
+        text=result
+    )]
+
+# Tool name -> handler. Handlers run in a worker thread through run_tool, so they
+# may block; in-process object access must hold object_lock(repo).
+TOOL_HANDLERS: dict[str, Callable[[git.Repo, dict], list[TextContent]]] = {
+    GitTools.STATUS: _handle_status,
+    GitTools.DIFF_UNSTAGED: _handle_diff_unstaged,
+    GitTools.DIFF_STAGED: _handle_diff_staged,
+    GitTools.DIFF: _handle_diff,
+    GitTools.COMMIT: _handle_commit,
+    GitTools.ADD: _handle_add,
+    GitTools.RESET: _handle_reset,
+    GitTools.LOG: _handle_log,
+    GitTools.CREATE_BRANCH: _handle_create_branch,
+    GitTools.CHECKOUT: _handle_checkout,
+    GitTools.SHOW: _handle_show,
+    GitTools.GREP: _handle_grep,
+    GitTools.BRANCH: _handle_branch,
+}
+
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Share one execution between identical calls that overlap in time."""
+
+    def __init__(self) -> None:
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        # Shield the shared task so one caller being cancelled doesn't cancel it
+        # for everyone else waiting on the same result
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller went away
+
+@functools.cache
+def tool_definitions() -> list[Tool]:
+    """Return the tool list, generating the JSON schemas only once per process."""
+    return [
+        Tool(
+            name=GitTools.STATUS,
+            description="Shows the working tree status",
+            inputSchema=GitStatus.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.DIFF_UNSTAGED,
+            description="Shows changes in the working directory that are not yet staged",
+            inputSchema=GitDiffUnstaged.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.DIFF_STAGED,
+            description="Shows changes that are staged for commit",
+            inputSchema=GitDiffStaged.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.DIFF,
+            description="Shows differences between branches or commits",
+            inputSchema=GitDiff.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.COMMIT,
+            description="Records changes to the repository",
+            inputSchema=GitCommit.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=False,
+                destructiveHint=False,
+                idempotentHint=False,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.ADD,
+            description="Adds file contents to the staging area",
+            inputSchema=GitAdd.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=False,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.RESET,
+            description="Unstages all staged changes",
+            inputSchema=GitReset.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=False,
+                destructiveHint=True,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.LOG,
+            description="Shows the commit logs",
+            inputSchema=GitLog.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.CREATE_BRANCH,
+            description="Creates a new branch from an optional base branch",
+            inputSchema=GitCreateBranch.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=False,
+                destructiveHint=False,
+                idempotentHint=False,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.CHECKOUT,
+            description="Switches branches",
+            inputSchema=GitCheckout.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=False,
+                destructiveHint=False,
+                idempotentHint=False,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.SHOW,
+            description="Shows the contents of a commit",
+            inputSchema=GitShow.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.GREP,
+            description="Search for a pattern in the repository",
+            inputSchema=GitGrep.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        ),
+        Tool(
+            name=GitTools.BRANCH,
+            description="List Git branches",
+            inputSchema=GitBranch.model_json_schema(),
+            annotations=ToolAnnotations(
+                readOnlyHint=True,
+                destructiveHint=False,
+                idempotentHint=True,
+                openWorldHint=False,
+            ),
+        )
+    ]
+
+
+@functools.cache
+def read_only_tools() -> frozenset[str]:
+    return frozenset(
+        tool.name for tool in tool_definitions()
+        if tool.annotations is not None and tool.annotations.readOnlyHint
+    )
+
+def run_tool(name: str, repo: git.Repo, arguments: dict) -> list[TextContent]:
+    """Run the handler of tool name, one write tool at a time per repository.
+
+    Read-only tools run without the write lock, so they never wait behind a write.
+    """
+    handler = TOOL_HANDLERS[name]
+    if name in read_only_tools():
+        return handler(repo, arguments)
+    with _WRITE_LOCKS.setdefault(Path(repo.git_dir), threading.Lock()):
+        return handler(repo, arguments)
+
+
 async def serve(repository: Path | None) -> None:
     logger = logging.getLogger(__name__)
 
@@ -392,153 +1059,21 @@ async def serve(repository: Path | None) -> None:
 
     server = Server("mcp-git")
 
+    # Git commands run in worker threads so a slow command does not block the
+    # event loop; the semaphore keeps a burst of calls from forking too many gits
+    git_slots = asyncio.Semaphore(os.cpu_count() or 1)
+
+    async def run_git(func, *args):
+        async with git_slots:
+            return await asyncio.to_thread(func, *args)
+
+    # Overlapping identical read-only calls (e.g. parallel sub-agents polling
+    # status) share one git invocation; tools with side effects always run
+    in_flight = SingleFlight()
+
     @server.list_tools()
     async def list_tools() -> list[Tool]:
-        return [
-            Tool(
-                name=GitTools.STATUS,
-                description="Shows the working tree status",
-                inputSchema=GitStatus.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.DIFF_UNSTAGED,
-                description="Shows changes in the working directory that are not yet staged",
-                inputSchema=GitDiffUnstaged.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.DIFF_STAGED,
-                description="Shows changes that are staged for commit",
-                inputSchema=GitDiffStaged.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.DIFF,
-                description="Shows differences between branches or commits",
-                inputSchema=GitDiff.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.COMMIT,
-                description="Records changes to the repository",
-                inputSchema=GitCommit.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=False,
-                    destructiveHint=False,
-                    idempotentHint=False,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.ADD,
-                description="Adds file contents to the staging area",
-                inputSchema=GitAdd.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=False,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.RESET,
-                description="Unstages all staged changes",
-                inputSchema=GitReset.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=False,
-                    destructiveHint=True,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.LOG,
-                description="Shows the commit logs",
-                inputSchema=GitLog.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.CREATE_BRANCH,
-                description="Creates a new branch from an optional base branch",
-                inputSchema=GitCreateBranch.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=False,
-                    destructiveHint=False,
-                    idempotentHint=False,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.CHECKOUT,
-                description="Switches branches",
-                inputSchema=GitCheckout.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=False,
-                    destructiveHint=False,
-                    idempotentHint=False,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.SHOW,
-                description="Shows the contents of a commit",
-                inputSchema=GitShow.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.GREP,
-                description="Search for a pattern in the repository",
-                inputSchema=GitGrep.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            ),
-            Tool(
-                name=GitTools.BRANCH,
-                description="List Git branches",
-                inputSchema=GitBranch.model_json_schema(),
-                annotations=ToolAnnotations(
-                    readOnlyHint=True,
-                    destructiveHint=False,
-                    idempotentHint=True,
-                    openWorldHint=False,
-                ),
-            )
-        ]
+        return list(tool_definitions())
 
     async def list_repos() -> Sequence[str]:
         async def by_roots() -> Sequence[str]:
@@ -552,15 +1087,9 @@ async def serve(repository: Path | None) -> None:
 
             roots_result: ListRootsResult = await server.request_context.session.list_roots()
             logger.debug(f"Roots result: {roots_result}")
-            repo_paths = []
-            for root in roots_result.roots:
-                path = root.uri.path
-                try:
-                    git.Repo(path)
-                    repo_paths.append(str(path))
-                except git.InvalidGitRepositoryError:
-                    pass
-            return repo_paths
+            paths = [root.uri.path for root in roots_result.roots if root.uri.path is not None]
+            is_repo = await asyncio.gather(*(asyncio.to_thread(_is_repo, path) for path in paths))
+            return [path for path, ok in zip(paths, is_repo) if ok]
 
         def by_commandline() -> Sequence[str]:
             return [str(repository)] if repository is not None else []
@@ -571,154 +1100,20 @@ async def serve(repository: Path | None) -> None:
 
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-        repo_path = Path(arguments["repo_path"])
+        if name not in TOOL_HANDLERS:
+            raise ValueError(f"Unknown tool: {name}")
 
         # Validate repo_path is within allowed repository
-        validate_repo_path(repo_path, repository)
+        repo_path = validate_repo_path(Path(arguments["repo_path"]), repository)
 
         # For all commands, we need an existing repo
-        repo = git.Repo(repo_path)
-
-        match name:
-            case GitTools.STATUS:
-                status = git_status(repo, arguments.get("paths"))
-                return [TextContent(
-                    type="text",
-                    text=f"Repository status:\n{status}"
-                )]
-
-            case GitTools.DIFF_UNSTAGED:
-                diff = git_diff_unstaged(
-                    repo, 
-                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
-                    arguments.get("ignore_whitespace", False),
-                    arguments.get("paths")
-                )
-                return [TextContent(
-                    type="text",
-                    text=f"Unstaged changes:\n{diff}"
-                )]
-
-            case GitTools.DIFF_STAGED:
-                diff = git_diff_staged(
-                    repo, 
-                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
-                    arguments.get("ignore_whitespace", False),
-                    arguments.get("paths")
-                )
-                return [TextContent(
-                    type="text",
-                    text=f"Staged changes:\n{diff}"
-                )]
-
-            case GitTools.DIFF:
-                diff = git_diff(
-                    repo, 
-                    arguments["target"], 
-                    arguments.get("base"),
-                    arguments.get("merge_base", False),
-                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
-                    arguments.get("ignore_whitespace", False),
-                    arguments.get("paths")
-                )
-                return [TextContent(
-                    type="text",
-                    text=f"Diff with {arguments['target']}:\n{diff}"
-                )]
-
-            case GitTools.COMMIT:
-                result = git_commit(
-                    repo, 
-                    arguments["message"],
-                    arguments.get("author_name"),
-                    arguments.get("author_email")
-                )
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.ADD:
-                result = git_add(repo, arguments["files"])
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.RESET:
-                result = git_reset(repo, arguments.get("paths"))
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.LOG:
-                log = git_log(
-                    repo,
-                    arguments.get("max_count", 10),
-                    arguments.get("revision_range"),
-                    arguments.get("paths"),
-                    arguments.get("start_timestamp"),
-                    arguments.get("end_timestamp")
-                )
-                return [TextContent(
-                    type="text",
-                    text="Commit history:\n" + "\n".join(log)
-                )]
-
-            case GitTools.CREATE_BRANCH:
-                result = git_create_branch(
-                    repo,
-                    arguments["branch_name"],
-                    arguments.get("base_branch")
-                )
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.CHECKOUT:
-                result = git_checkout(repo, arguments["branch_name"])
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.SHOW:
-                result = git_show(repo, arguments["revision"])
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.GREP:
-                result = git_grep(
-                    repo,
-                    arguments["pattern"],
-                    arguments.get("revision"),
-                    arguments.get("paths"),
-                    arguments.get("ignore_case", False),
-                    arguments.get("line_numbers", True),
-                )
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case GitTools.BRANCH:
-                result = git_branch(
-                    repo,
-                    arguments.get("branch_type", 'local'),
-                    arguments.get("contains", None),
-                    arguments.get("not_contains", None),
-                )
-                return [TextContent(
-                    type="text",
-                    text=result
-                )]
-
-            case _:
-                raise ValueError(f"Unknown tool: {name}")
+        repo = get_repo(repo_path)
+
+        if name not in read_only_tools():
+            return await run_git(run_tool, name, repo, arguments)
+        key = (name, repo.git_dir, json.dumps(arguments, sort_keys=True))
+        result = await in_flight.run(key, lambda: run_git(run_tool, name, repo, arguments))
+        return list(result)
 
     options = server.create_initialization_options()
     async with stdio_server() as (read_stream, write_stream):
@@ -1,5 +1,9 @@
+import asyncio
 import os
 import stat
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from pathlib import Path
 import git
@@ -19,7 +23,17 @@ from mcp_server_git.server import (
     git_show,
     git_grep,
     validate_repo_path,
+    get_repo,
+    object_lock,
+    close_repos,
+    tool_definitions,
+    normalize_pathspecs,
+    GitTools,
+    TOOL_HANDLERS,
+    run_tool,
+    SingleFlight,
 )
+import mcp_server_git.server as server
 import shutil
 
 
@@ -67,6 +81,15 @@ def test_git_checkout_nonexistent_branch(test_repository):
     with pytest.raises(BadName):
         git_checkout(test_repository, "nonexistent-branch")
 
+def test_git_checkout_does_not_treat_name_as_path(test_repository):
+    file_path = Path(test_repository.working_dir) / "test.txt"
+    file_path.write_text("local edits")
+
+    with pytest.raises(BadName):
+        git_checkout(test_repository, "test.txt")
+
+    assert file_path.read_text() == "local edits"
+
 def test_git_branch_local(test_repository):
     test_repository.git.branch("new-branch-local")
     result = git_branch(test_repository, "local")
@@ -138,19 +161,112 @@ def test_git_status(test_repository):
     assert result is not None
     assert "On branch" in result or "branch" in result.lower()
 
+def test_git_status_changes(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    (working_dir / "test.txt").write_text("modified")
+    (working_dir / "staged.txt").write_text("staged")
+    test_repository.index.add(["staged.txt"])
+    (working_dir / "untracked file.txt").write_text("untracked")
+
+    result = git_status(test_repository)
+
+    assert result.splitlines() == [
+        f"On branch {test_repository.active_branch.name}",
+        "A  staged.txt",
+        " M test.txt",
+        "?? untracked file.txt",
+    ]
+
+def test_git_status_rename(test_repository):
+    test_repository.git.mv("test.txt", "renamed.txt")
+
+    result = git_status(test_repository)
+
+    assert "R  test.txt -> renamed.txt" in result.splitlines()
+
+def test_git_status_clean_detached(test_repository):
+    sha = test_repository.head.commit.hexsha
+    test_repository.git.checkout(sha)
+
+    result = git_status(test_repository)
+
+    assert result.splitlines() == [
+        f"HEAD detached at {sha[:7]}",
+        "nothing to commit, working tree clean",
+    ]
+
+def test_git_status_upstream(test_repository, tmp_path: Path):
+    clone = test_repository.clone(tmp_path / "clone")
+    try:
+        (Path(clone.working_dir) / "ahead.txt").write_text("ahead")
+        clone.index.add(["ahead.txt"])
+        clone.index.commit("ahead commit")
+
+        result = git_status(clone)
+
+        assert f"Upstream: origin/{clone.active_branch.name} (ahead 1, behind 0)" in result.splitlines()
+    finally:
+        clone.close()
+
 def test_git_diff_unstaged(test_repository):
     file_path = Path(test_repository.working_dir) / "test.txt"
     file_path.write_text("modified content")
 
     result = git_diff_unstaged(test_repository)
 
-    assert "test.txt" in result
-    assert "modified content" in result
+    assert b"test.txt" in result
+    assert b"modified content" in result
 
 def test_git_diff_unstaged_empty(test_repository):
     result = git_diff_unstaged(test_repository)
 
-    assert result == ""
+    assert result == b""
+
+def test_git_diff_unstaged_non_utf8(test_repository):
+    file_path = Path(test_repository.working_dir) / "test.txt"
+    file_path.write_bytes("caf\xe9\n".encode("latin-1"))
+
+    result = git_diff_unstaged(test_repository)
+
+    assert b"+caf\xe9" in result
+
+def test_git_diff_unstaged_summary_only(test_repository):
+    file_path = Path(test_repository.working_dir) / "test.txt"
+    file_path.write_text("modified content\nsecond line\n")
+
+    result = git_diff_unstaged(test_repository, summary_only=True)
+
+    assert b"M\ttest.txt" in result
+    assert b"2\t1\ttest.txt" in result
+    assert b"modified content" not in result
+
+def test_git_diff_unstaged_large_patch_is_summarized(test_repository, monkeypatch):
+    monkeypatch.setattr(server, "MAX_PATCH_BYTES", 10)
+    file_path = Path(test_repository.working_dir) / "test.txt"
+    file_path.write_text("modified content")
+
+    result = git_diff_unstaged(test_repository)
+
+    assert result.startswith(b"Patch is ")
+    assert b"1\t1\ttest.txt" in result
+    assert b"modified content" not in result
+
+def test_iter_stdout_raises_on_git_failure(test_repository):
+    proc = test_repository.git.log("no-such-revision", as_process=True)
+
+    with pytest.raises(git.GitCommandError, match="no-such-revision"):
+        list(server._iter_stdout(proc))
+
+def test_iter_stdout_close_stops_git(test_repository):
+    proc = test_repository.git.cat_file("--batch", as_process=True, istream=subprocess.PIPE)
+    proc.stdin.write(b"HEAD\n")
+    proc.stdin.flush()
+    chunks = server._iter_stdout(proc)
+
+    assert next(chunks)
+    chunks.close()
+
+    assert proc.proc.wait(timeout=5) != 0
 
 def test_git_diff_staged(test_repository):
     file_path = Path(test_repository.working_dir) / "staged_file.txt"
@@ -159,13 +275,13 @@ def test_git_diff_staged(test_repository):
 
     result = git_diff_staged(test_repository)
 
-    assert "staged_file.txt" in result
-    assert "staged content" in result
+    assert b"staged_file.txt" in result
+    assert b"staged content" in result
 
 def test_git_diff_staged_empty(test_repository):
     result = git_diff_staged(test_repository)
 
-    assert result == ""
+    assert result == b""
 
 def test_git_diff(test_repository):
     # Get the default branch name (could be "main" or "master")
@@ -178,8 +294,8 @@ def test_git_diff(test_repository):
 
     result = git_diff(test_repository, default_branch)
 
-    assert "test.txt" in result
-    assert "feature changes" in result
+    assert b"test.txt" in result
+    assert b"feature changes" in result
 
 def test_git_commit(test_repository):
     file_path = Path(test_repository.working_dir) / "commit_test.txt"
@@ -215,22 +331,71 @@ def test_git_log(test_repository):
         test_repository.index.add([f"log_test_{i}.txt"])
         test_repository.index.commit(f"commit {i}")
 
-    result = git_log(test_repository, max_count=2)
+    result = list(git_log(test_repository, max_count=2))
 
-    assert isinstance(result, list)
     assert len(result) == 2
     assert "Commit:" in result[0]
     assert "Author:" in result[0]
     assert "Date:" in result[0]
     assert "Message:" in result[0]
 
+def test_normalize_pathspecs():
+    assert normalize_pathspecs(["src/*", "docs/**", "a/**/*"]) == ["src", "docs", "a"]
+    assert normalize_pathspecs(["*.py", "src/*/x", "s[ab]/*", ":(glob)src/*", "/*"]) == [
+        "*.py", "src/*/x", "s[ab]/*", ":(glob)src/*", "/*"
+    ]
+    assert normalize_pathspecs(["README.md"]) == ["README.md"]
+
+def test_git_log_directory_glob(test_repository):
+    sub = Path(test_repository.working_dir) / "sub"
+    sub.mkdir()
+    (sub / "nested.txt").write_text("nested")
+    test_repository.index.add(["sub/nested.txt"])
+    test_repository.index.commit("add nested file")
+
+    result = list(git_log(test_repository, paths=["sub/*"]))
+
+    assert len(result) == 1
+    assert "add nested file" in result[0]
+
 def test_git_log_default(test_repository):
-    result = git_log(test_repository)
+    result = list(git_log(test_repository))
 
-    assert isinstance(result, list)
     assert len(result) >= 1
     assert "initial commit" in result[0]
 
+def test_git_log_entry_format(test_repository):
+    test_repository.index.commit("subject line\n\nbody with \x1f separator\n",
+                                 author=git.Actor("Log Author", "log@example.com"))
+    commit = test_repository.head.commit
+
+    result = list(git_log(test_repository, max_count=1))
+
+    assert result == [
+        f"Commit: {commit.hexsha}\n"
+        "Author: Log Author <log@example.com>\n"
+        f"Date: {commit.authored_datetime.isoformat()}\n"
+        "Message: subject line\n\nbody with \x1f separator\n"
+    ]
+
+def test_format_commit_decodes_bytes_message(test_repository):
+    commit = test_repository.head.commit
+    commit.message = b"caf\xc3\xa9 \xff\n"
+
+    assert "Message: caf\u00e9 \ufffd\n" in server._format_commit(commit)
+
+def test_git_log_unknown_revision(test_repository):
+    with pytest.raises(git.GitCommandError):
+        list(git_log(test_repository, revision_range="no-such-branch"))
+
+def test_git_log_is_lazy(test_repository):
+    result = git_log(test_repository)
+
+    assert not isinstance(result, list)
+    entry = next(result)
+    assert f"Commit: {test_repository.head.commit.hexsha}\n" in entry
+    assert "Message: initial commit\n" in entry
+
 def test_git_create_branch(test_repository):
     result = git_create_branch(test_repository, "new-feature-branch")
 
@@ -260,20 +425,115 @@ def test_git_show(test_repository):
 
     result = git_show(test_repository, commit_sha)
 
-    assert "Commit:" in result
-    assert "Author:" in result
-    assert "show test commit" in result
-    assert "show_test.txt" in result
+    assert b"Commit:" in result
+    assert b"Author:" in result
+    assert b"show test commit" in result
+    assert b"show_test.txt" in result
+
+def test_git_show_non_utf8_content(test_repository):
+    file_path = Path(test_repository.working_dir) / "latin1.txt"
+    file_path.write_bytes("caf\xe9\n".encode("latin-1"))
+    test_repository.index.add(["latin1.txt"])
+    test_repository.index.commit("latin-1 commit")
+
+    result = git_show(test_repository, "HEAD")
+
+    assert b"latin1.txt" in result
+    assert b"caf\xe9" in result
+
+def test_git_show_skips_large_files(test_repository, monkeypatch):
+    monkeypatch.setattr(server, "MAX_DIFF_BYTES", 100)
+    working_dir = Path(test_repository.working_dir)
+    (working_dir / "big.txt").write_text("big line\n" * 50)
+    (working_dir / "small.txt").write_text("small content\n")
+    test_repository.index.add(["big.txt", "small.txt"])
+    test_repository.index.commit("big and small")
+
+    result = git_show(test_repository, "HEAD")
+
+    assert b"+++ big.txt\nDiff omitted: file is larger than 100 bytes" in result
+    assert b"big line" not in result
+    assert b"+small content" in result
+
+def test_git_show_rename(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    (working_dir / "test.txt").write_text("line\n" * 5)
+    test_repository.index.add(["test.txt"])
+    test_repository.index.commit("longer file")
+    test_repository.git.mv("test.txt", "moved.txt")
+    (working_dir / "moved.txt").write_text("line\n" * 4 + "changed\n")
+    test_repository.index.add(["moved.txt"])
+    test_repository.index.commit("move and edit file")
+
+    result = git_show(test_repository, "HEAD")
+
+    assert b"--- test.txt\n+++ moved.txt\n@@" in result
+    assert b"-line\n+changed" in result
+
+def test_git_show_keeps_file_order(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    names = [f"file_{i:02}.txt" for i in range(20)]
+    for name in names:
+        (working_dir / name).write_text(f"content of {name}\n")
+    test_repository.index.add(names)
+    test_repository.index.commit("many files")
+
+    result = git_show(test_repository, "HEAD")
+
+    positions = [result.index(f"+content of {name}".encode()) for name in names]
+    assert positions == sorted(positions)
+    assert all(result.index(f"+++ {name}".encode()) < pos for name, pos in zip(names, positions))
+
+def test_git_show_type_change(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    for name in ("a", "b", "c"):
+        (working_dir / name).write_text(f"{name} one\n")
+    test_repository.index.add(["a", "b", "c"])
+    test_repository.index.commit("files")
+    (working_dir / "a").unlink()
+    (working_dir / "a").symlink_to("b")
+    (working_dir / "b").write_text("b two\n")
+    (working_dir / "c").write_text("c two\n")
+    test_repository.git.add("a", "b", "c")
+    test_repository.index.commit("type change")
+
+    result = git_show(test_repository, "HEAD").decode()
+
+    sections = result.split("\n--- ")[1:]
+    assert [section.split("\n", 1)[0] for section in sections] == ["a", "b", "c"]
+    assert "-a one" in sections[0] and "+b" in sections[0]
+    assert "-b one" in sections[1] and "+b two" in sections[1]
+    assert "-c one" in sections[2] and "+c two" in sections[2]
 
 def test_git_show_initial_commit(test_repository):
     initial_commit = list(test_repository.iter_commits())[-1]
 
     result = git_show(test_repository, initial_commit.hexsha)
 
-    assert "Commit:" in result
-    assert "initial commit" in result
-    assert "test.txt" in result
+    assert b"Commit:" in result
+    assert b"initial commit" in result
+    assert b"test.txt" in result
+
 
+def test_git_grep(test_repository):
+    (Path(test_repository.working_dir) / "grep.txt").write_text("alpha\nbeta\nAlpha\n")
+    test_repository.index.add(["grep.txt"])
+
+    result = git_grep(test_repository, "alpha", ignore_case=True)
+
+    assert result.splitlines() == ["grep.txt:1:alpha", "grep.txt:3:Alpha"]
+
+def test_git_grep_searches_tracked_files_only(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    (working_dir / "tracked.txt").write_text("*needle\n")
+    (working_dir / "data.bin").write_bytes(b"\0*needle\0")
+    (working_dir / "untracked.txt").write_text("*needle\n")
+    test_repository.index.add(["tracked.txt", "data.bin"])
+
+    # A leading '*' is literal in git grep's basic regexes
+    result = git_grep(test_repository, "*needle")
+
+    assert result.splitlines() == ["Binary file data.bin matches", "tracked.txt:1:*needle"]
 
 # Tests for validate_repo_path (repository scoping security fix)
 
@@ -336,6 +596,26 @@ def test_validate_repo_path_symlink_escape(tmp_path: Path):
     with pytest.raises(ValueError) as exc_info:
         validate_repo_path(symlink, allowed)
     assert "outside the allowed repository" in str(exc_info.value)
+
+
+def test_validate_repo_path_rechecks_replaced_directory(tmp_path: Path):
+    """A directory replaced by a symlink after an earlier check is caught on the next call."""
+    allowed = tmp_path / "allowed_repo"
+    allowed.mkdir()
+    project = allowed / "project"
+    project.mkdir()
+    outside = tmp_path / "outside"
+    outside.mkdir()
+
+    assert validate_repo_path(project, allowed) == project.resolve()
+    project.rmdir()
+    project.symlink_to(outside)
+
+    with pytest.raises(ValueError) as exc_info:
+        validate_repo_path(project, allowed)
+    assert "outside the allowed repository" in str(exc_info.value)
+
+
 # Tests for argument injection protection
 
 def test_git_diff_rejects_flag_injection(test_repository):
@@ -376,11 +656,11 @@ def test_git_diff_allows_valid_refs(test_repository):
 
     # Test with branch name
     result = git_diff(test_repository, default_branch)
-    assert "test.txt" in result
+    assert b"test.txt" in result
 
     # Test with HEAD~1
     result = git_diff(test_repository, "HEAD~1")
-    assert "test.txt" in result
+    assert b"test.txt" in result
 
     # Test with commit hash
     commit_sha = test_repository.head.commit.hexsha
@@ -528,6 +808,21 @@ def test_git_branch_rejects_contains_flag_injection(test_repository):
         git_branch(test_repository, "local", not_contains="--exec=evil")
 
 
+def test_ref_arguments_reject_empty_and_nul(test_repository):
+    """Ref-like arguments must be non-empty and free of NUL bytes."""
+    with pytest.raises(BadName):
+        git_show(test_repository, "")
+
+    with pytest.raises(BadName):
+        git_checkout(test_repository, "main\0--orphan=evil")
+
+    with pytest.raises(BadName):
+        git_create_branch(test_repository, "")
+
+    with pytest.raises(BadName):
+        git_branch(test_repository, "local", contains="")
+
+
 # Tests for merge_base diff (PR review workflow)
 
 def test_git_diff_merge_base(test_repository):
@@ -549,12 +844,12 @@ def test_git_diff_merge_base(test_repository):
 
     # Without merge_base: diff includes target_file.txt (target moved ahead)
     result_two_dot = git_diff(test_repository, "pr-branch", base=default_branch, merge_base=False)
-    assert "target_file.txt" in result_two_dot
+    assert b"target_file.txt" in result_two_dot
 
     # With merge_base: diff only shows pr_file.txt (changes on PR branch since fork)
     result_three_dot = git_diff(test_repository, "pr-branch", base=default_branch, merge_base=True)
-    assert "pr_file.txt" in result_three_dot
-    assert "target_file.txt" not in result_three_dot
+    assert b"pr_file.txt" in result_three_dot
+    assert b"target_file.txt" not in result_three_dot
 
 
 def test_git_diff_merge_base_default_false(test_repository):
@@ -585,4 +880,207 @@ def test_git_diff_merge_base_without_base(test_repository):
 
     # No base supplied – merge_base flag is silently ignored, normal ref diff runs
     result = git_diff(test_repository, "feature-no-base", merge_base=True)
-    assert "test.txt" in result
+    assert b"test.txt" in result
+
+
+# Tests for the repository cache
+
+@pytest.fixture
+def no_commit_graph(monkeypatch):
+    # Keep the background commit-graph writer from racing test cleanup
+    monkeypatch.setattr(server, "_write_commit_graph", lambda repo: None)
+
+
+def test_get_repo_reuses_cached_instance(test_repository, no_commit_graph):
+    repo_path = Path(test_repository.working_dir)
+    try:
+        first = get_repo(repo_path)
+        second = get_repo(repo_path / ".")
+        assert first is second
+        assert first is not test_repository
+    finally:
+        close_repos()
+
+
+def test_get_repo_does_not_resolve_again(test_repository, monkeypatch, no_commit_graph):
+    repo_path = validate_repo_path(Path(test_repository.working_dir), None)
+
+    def fail(self, strict=False):
+        raise AssertionError("repo_path was resolved again")
+
+    monkeypatch.setattr(Path, "resolve", fail)
+    try:
+        get_repo(repo_path)
+        assert list(server._REPO_CACHE) == [repo_path]
+    finally:
+        close_repos()
+
+
+def test_get_repo_reuses_cat_file_process(test_repository, no_commit_graph):
+    try:
+        repo = get_repo(Path(test_repository.working_dir))
+        git_show(repo, "HEAD")
+        cat_file = repo.git.cat_file_all
+        assert cat_file is not None
+
+        git_show(get_repo(Path(test_repository.working_dir)), "HEAD")
+        assert repo.git.cat_file_all is cat_file
+    finally:
+        close_repos()
+
+
+def test_get_repo_evicts_least_recently_used(tmp_path: Path, monkeypatch, no_commit_graph):
+    monkeypatch.setattr(server, "REPO_CACHE_SIZE", 2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"repo_{i}"
+        git.Repo.init(path).close()
+        paths.append(path)
+    try:
+        first = get_repo(paths[0])
+        get_repo(paths[1])
+        assert get_repo(paths[0]) is first  # refresh repo_0 so repo_1 is evicted
+        get_repo(paths[2])
+        assert list(server._REPO_CACHE) == [paths[0].resolve(), paths[2].resolve()]
+    finally:
+        close_repos()
+    assert not server._REPO_CACHE
+
+
+def test_get_repo_configures_git(test_repository, no_commit_graph):
+    try:
+        repo = get_repo(Path(test_repository.working_dir))
+        assert repo.git.config("--get", "core.commitGraph") == "true"
+        assert repo.git.config("--get", "commitGraph.readChangedPaths") == "true"
+        assert repo.git.environment()["GIT_OPTIONAL_LOCKS"] == "0"
+    finally:
+        close_repos()
+
+
+def test_object_lock_is_per_git_dir(test_repository, no_commit_graph):
+    try:
+        repo = get_repo(Path(test_repository.working_dir))
+
+        assert object_lock(repo) is object_lock(test_repository)
+        with object_lock(repo):
+            # Subprocess-only tools don't wait for the lock
+            assert git_status(repo) == git_status(test_repository)
+            assert list(git_log(repo))
+    finally:
+        close_repos()
+
+
+def test_write_commit_graph(test_repository):
+    server._write_commit_graph(test_repository)
+
+    assert (Path(test_repository.git_dir) / "objects" / "info" / "commit-graph").exists()
+
+
+def test_write_commit_graph_keeps_existing_graph(test_repository):
+    graph = Path(test_repository.git_dir) / "objects" / "info" / "commit-graph"
+    graph.parent.mkdir(parents=True, exist_ok=True)
+    graph.write_bytes(b"existing")
+
+    server._write_commit_graph(test_repository)
+
+    assert graph.read_bytes() == b"existing"
+
+
+def test_get_repo_writes_commit_graph_once_per_git_dir(test_repository, monkeypatch):
+    written = []
+    monkeypatch.setattr(server, "_write_commit_graph", written.append)
+    repo_path = Path(test_repository.working_dir)
+    try:
+        get_repo(repo_path)
+        close_repos()
+        get_repo(repo_path)  # Reopened as if evicted from the cache
+    finally:
+        close_repos()
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(timeout=5)
+
+    assert len(written) == 1
+
+
+def test_tool_definitions_cover_all_tools():
+    tools = tool_definitions()
+
+    assert tools is tool_definitions()
+    assert {tool.name for tool in tools} == {tool.value for tool in GitTools}
+
+
+def test_tool_handlers_cover_all_tools():
+    assert set(TOOL_HANDLERS) == set(GitTools)
+
+
+def test_run_tool_serializes_concurrent_writes(test_repository):
+    working_dir = Path(test_repository.working_dir)
+    names = [f"parallel_{i}.txt" for i in range(40)]
+    for name in names:
+        (working_dir / name).write_text(name)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [
+            pool.submit(run_tool, "git_add", test_repository, {"repo_path": str(working_dir), "files": [name]})
+            for name in names
+        ]
+        results = [future.result() for future in futures]  # Raises if any git add failed
+
+    assert all(result[0].text == "Files staged successfully" for result in results)
+    assert set(names) <= {path for path, _ in test_repository.index.entries}
+
+
+def test_tool_handler_formats_result(test_repository):
+    (Path(test_repository.working_dir) / "test.txt").write_text("handler content")
+
+    result = TOOL_HANDLERS["git_diff_unstaged"](test_repository, {"repo_path": test_repository.working_dir})
+
+    assert len(result) == 1
+    assert result[0].text.startswith("Unstaged changes:\n")
+    assert "+handler content" in result[0].text
+
+
+def test_single_flight_shares_overlapping_calls():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        flight = SingleFlight()
+        first = await asyncio.gather(*(flight.run("k", work) for _ in range(5)))
+        second = await flight.run("k", work)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == [1] * 5
+    assert second == 2
+
+
+def test_single_flight_propagates_errors_and_survives_cancellation():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.ensure_future(flight.run("k", fail))
+        waiting = asyncio.ensure_future(flight.run("k", fail))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(ValueError, match="boom"):
+            await waiting
+
+    asyncio.run(main())
+
+
+def test_is_repo(test_repository, tmp_path: Path):
+    assert server._is_repo(test_repository.working_dir)
+    assert not server._is_repo(str(tmp_path / "missing"))
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    assert not server._is_repo(str(plain))